@@ -15,18 +15,33 @@ Styling:
 
 from __future__ import annotations
 
+import os
 import sys
 import json
-import base64
+import mmap
 import subprocess
+import threading
 from datetime import datetime, UTC
 from pathlib import Path
 import argparse
 import html as html_mod
+import urllib.parse
 
 from table_testruns import build_testruns_table
 from table_milestones import fetch_milestones_map, build_milestones_table, build_rows_from_map
 
+# pybase64 (SIMD encoder) is optional and API-compatible with stdlib base64
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+# orjson is optional; fall back to stdlib json when the wheel is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Try to import velocity_chart (chart generator moved here); if unavailable continue silently
 try:
     from velocity_chart import generate_velocity_chart
@@ -40,50 +55,8 @@ DEFAULT_RESULTS_JSON = REPO_DIR / "results.json"
 DEFAULT_OUTPUT_DIR = REPO_DIR / "output"
 
 
-def run_subprocess(cmd, desc, cwd=None):
-    print(f"▶️ {desc}: {' '.join(map(str, cmd))}")
-    try:
-        subprocess.run(cmd, check=True, cwd=cwd)
-        print(f"✅ {desc} finished")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {desc} failed: {e}", file=sys.stderr)
-        sys.exit(1)
-
-
-def write_json(path: Path, obj):
-    try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
-        print(f"✅ Wrote JSON: {path}")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to write JSON {path}: {e}", file=sys.stderr)
-        return False
-
-
-def load_json(path: Path):
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"⚠️ Failed to load {path}: {e}", file=sys.stderr)
-        return {}
-
-
-def find_latest_chart_bytes(output_dir: Path):
-    try:
-        files = sorted([p for p in output_dir.glob("delta_*.png")])
-        if not files:
-            raise FileNotFoundError("No delta_*.png found in output/")
-        latest = files[-1]
-        return latest.read_bytes(), latest.name
-    except Exception as e:
-        print(f"⚠️ Chart PNG not found or failed to load: {e}", file=sys.stderr)
-        return None, None
-
-
-def build_html(title, generated_for_date, chart_data_uri, milestone_html, testruns_html, milestone_intro_text=""):
-    css = """
+# Static report stylesheet; built once at import instead of on every build_html call
+_REPORT_CSS = """
     body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial; margin:28px; color:#222; background:#fff; }
     header { margin-bottom:18px; }
     h1 { font-size:20px; margin:0 0 6px 0; }
@@ -147,24 +120,10 @@ def build_html(title, generated_for_date, chart_data_uri, milestone_html, testru
     footer { margin-top:18px; color:#666; font-size:13px; }
     .small { font-size:13px; color:#666; }
     """
-    intro_block = f"<div class='milestone-intro'>{html_mod.escape(milestone_intro_text)}</div>" if milestone_intro_text else ""
-    html_doc = f"""<!doctype html>
-<html lang="en">
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width,initial-scale=1">
-<title>{html_mod.escape(title)}</title>
-<style>{css}</style>
-</head>
-<body>
-<header>
-  <h1>{html_mod.escape(title)}</h1>
-  <div class="meta">Report generated for date: <strong>{html_mod.escape(generated_for_date)}</strong></div>
-</header>
+_REPORT_CSS_BYTES = _REPORT_CSS.encode("utf-8")
 
-<section class="milestone-section">
-  {intro_block}
-  {milestone_html}
+# Static document segments between the dynamic parts of the report, pre-encoded once
+_HTML_TESTRUNS_OPEN = b"""
 </section>
 
 <section class="placeholder">
@@ -172,7 +131,8 @@ def build_html(title, generated_for_date, chart_data_uri, milestone_html, testru
 </section>
 
 <section class="table-placeholder" id="table-placeholder">
-  {testruns_html}
+  """
+_HTML_CHART_OPEN = b'''
 </section>
 
 <section class="extra">
@@ -180,15 +140,144 @@ def build_html(title, generated_for_date, chart_data_uri, milestone_html, testru
 </section>
 
 <section class="chart">
-  <img class="chart-img" alt="Historical executed results chart" src="{chart_data_uri}" />
+  <img class="chart-img" alt="Historical executed results chart" src="'''
+_HTML_FOOTER_OPEN = b"""" />
 </section>
 
 <footer>
-  <div class="small">Generated: {datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S UTC")}</div>
+  <div class="small">Generated: """
+_HTML_CLOSE = b"""</div>
 </footer>
 </body>
 </html>"""
-    return html_doc
+
+
+def run_subprocess(cmd, desc, cwd=None):
+    print(f"▶️ {desc}: {' '.join(map(str, cmd))}")
+    # subprocess only takes the posix_spawn fast path when close_fds is off and
+    # no cwd change is requested, so drop cwd when we are already there
+    if cwd is not None and Path(cwd).resolve() == Path.cwd().resolve():
+        cwd = None
+    try:
+        subprocess.run(cmd, check=True, cwd=cwd, close_fds=False)
+        print(f"✅ {desc} finished")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ {desc} failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def write_json(path: Path, obj):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if orjson is not None:
+            path.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ Wrote JSON: {path}")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to write JSON {path}: {e}", file=sys.stderr)
+        return False
+
+
+def _write_milestone_json(path: Path, payload):
+    if not write_json(path, payload):
+        print("⚠️ Continuing despite milestone JSON write failure", file=sys.stderr)
+
+
+def load_json(path: Path):
+    try:
+        if orjson is not None:
+            return orjson.loads(path.read_bytes())
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Failed to load {path}: {e}", file=sys.stderr)
+        return {}
+
+
+def find_latest_chart(output_dir: Path):
+    try:
+        # one scandir pass over plain names; only the winner becomes a Path
+        with os.scandir(output_dir) as it:
+            names = [e.name for e in it if e.name.startswith("delta_") and e.name.endswith(".png")]
+        if not names:
+            raise FileNotFoundError("No delta_*.png found in output/")
+        return output_dir / max(names)
+    except Exception as e:
+        print(f"⚠️ Chart PNG not found: {e}", file=sys.stderr)
+        return None
+
+
+def map_chart_file(path: Path):
+    """Memory-map a chart PNG read-only so it can be base64-encoded without a heap copy."""
+    try:
+        with path.open("rb") as fh:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception as e:
+        print(f"⚠️ Chart PNG failed to load: {e}", file=sys.stderr)
+        return None
+
+
+def iter_html(title, generated_for_date, chart_data_uri, milestone_html, testruns_html, milestone_intro_text="",
+              chart_png=None):
+    """
+    Yield the report document as UTF-8 byte chunks, in document order.
+    Large inputs (table HTML, chart data URI) are encoded and yielded on their own
+    so a writer never has to hold the whole document in memory.
+    If chart_png bytes are given they are embedded as a base64 data URI (chart_data_uri is ignored);
+    the encoded bytes are yielded as-is, never decoded into a str.
+    """
+    # stamp once up front so the footer reflects when rendering started
+    generated_at = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
+    esc_title = html_mod.escape(title)
+    intro_block = f"<div class='milestone-intro'>{html_mod.escape(milestone_intro_text)}</div>" if milestone_intro_text else ""
+    yield f"""<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>{esc_title}</title>
+<style>""".encode("utf-8")
+    yield _REPORT_CSS_BYTES
+    yield f"""</style>
+</head>
+<body>
+<header>
+  <h1>{esc_title}</h1>
+  <div class="meta">Report generated for date: <strong>{html_mod.escape(generated_for_date)}</strong></div>
+</header>
+
+<section class="milestone-section">
+  {intro_block}
+  """.encode("utf-8")
+    yield milestone_html.encode("utf-8")
+    yield _HTML_TESTRUNS_OPEN
+    yield testruns_html.encode("utf-8")
+    yield _HTML_CHART_OPEN
+    if chart_png is not None:
+        yield b"data:image/png;base64,"
+        yield base64.b64encode(memoryview(chart_png))
+    else:
+        yield chart_data_uri.encode("utf-8")
+    yield _HTML_FOOTER_OPEN
+    yield generated_at.encode("ascii")
+    yield _HTML_CLOSE
+
+
+def build_html(title, generated_for_date, chart_data_uri, milestone_html, testruns_html, milestone_intro_text="",
+               chart_png=None):
+    return b"".join(iter_html(title, generated_for_date, chart_data_uri, milestone_html, testruns_html,
+                              milestone_intro_text, chart_png)).decode("utf-8")
+
+
+def write_html(path: Path, title, generated_for_date, chart_data_uri, milestone_html, testruns_html, milestone_intro_text="",
+               chart_png=None):
+    """Stream the report chunks from iter_html() straight into a buffered binary file."""
+    with path.open("wb", buffering=1 << 20) as fh:
+        for chunk in iter_html(title, generated_for_date, chart_data_uri, milestone_html, testruns_html,
+                               milestone_intro_text, chart_png):
+            fh.write(chunk)
 
 
 def resolve_script_path(default: Path, override: str | None):
@@ -212,6 +301,8 @@ def main(argv=None):
     parser.add_argument("--milestones-json", help="Path to milestones JSON to write/use", default=str(DEFAULT_MILESTONE_JSON))
     parser.add_argument("--output-dir", help="Directory for HTML and PNG outputs", default=str(DEFAULT_OUTPUT_DIR))
     parser.add_argument("--milestone-intro", help="Text shown above milestones table", default="")
+    parser.add_argument("--embed-chart", action="store_true",
+                        help="Embed the chart PNG as a base64 data URI (single-file report) instead of linking it")
     args = parser.parse_args(argv)
 
     repo_dir = REPO_DIR
@@ -233,20 +324,24 @@ def main(argv=None):
         "rows": rows,
         "milestone_map": milestone_map
     }
-    # Write milestone JSON for output consumption and debugging
-    if not write_json(milestones_json, payload):
-        print("⚠️ Continuing despite milestone JSON write failure", file=sys.stderr)
+    # Write milestone JSON for output consumption and debugging. omni.py never reads it,
+    # so serialize it on a background thread while the omni subprocess runs.
+    milestone_writer = threading.Thread(target=_write_milestone_json, args=(milestones_json, payload))
+    milestone_writer.start()
 
     # Log loaded IDs
-    ids = list(milestone_map.keys())
-    print(f"ℹ️ Milestones fetched: {len(ids)} — IDs: {', '.join(ids) if ids else 'none'}")
+    n_milestones = len(milestone_map)
+    print(f"ℹ️ Milestones fetched: {n_milestones} — IDs: {', '.join(milestone_map) if n_milestones else 'none'}")
 
     # 1) Run omni.py to produce results.json and chart PNG(s) into output/
-    run_subprocess(
-        [sys.executable, str(omni_py), "--json-out", str(results_json)],
-        "Generate results JSON and chart PNG",
-        cwd=repo_dir
-    )
+    try:
+        run_subprocess(
+            [sys.executable, str(omni_py), "--json-out", str(results_json)],
+            "Generate results JSON and chart PNG",
+            cwd=repo_dir
+        )
+    finally:
+        milestone_writer.join()
 
     # 2) Load runs
     omni = load_json(results_json)
@@ -254,34 +349,48 @@ def main(argv=None):
     grand = omni.get("grand", {})
     generated_for_date_runs = omni.get("generated_for_date", generated_for_date)
 
-    # 3) Chart to data URI
-    chart_bytes, chart_name = find_latest_chart_bytes(output_dir)
+    # 3) Chart: the report is written next to the PNG, so link it by relative name;
+    #    only inline it as a data URI when a single-file report is requested
     chart_data_uri = ""
-    if chart_bytes:
-        chart_data_uri = "data:image/png;base64," + base64.b64encode(chart_bytes).decode("ascii")
-        print(f"📈 Using chart: {chart_name}")
-
-    # 4) Build tables and HTML
-    milestone_html = build_milestones_table(milestone_map)
+    chart_png = None
+    if args.embed_chart:
+        chart_path = find_latest_chart(output_dir)
+        if chart_path is not None:
+            # mmap'd and encoded straight into the output stream by write_html
+            chart_png = map_chart_file(chart_path)
+            if chart_png is not None:
+                print(f"📈 Embedding chart: {chart_path.name}")
+    else:
+        chart_path = find_latest_chart(output_dir)
+        if chart_path is not None:
+            chart_data_uri = html_mod.escape(urllib.parse.quote(chart_path.name))
+            print(f"📈 Linking chart: {chart_path.name}")
+
+    # 4) Build tables
+    milestone_html = build_milestones_table(milestone_map, rows)
     testruns_html = build_testruns_table(run_rows, grand)
-    html_doc = build_html(
-        title="TestRail Report",
-        generated_for_date=generated_for_date_runs,
-        chart_data_uri=chart_data_uri,
-        milestone_html=milestone_html,
-        testruns_html=testruns_html,
-        milestone_intro_text=args.milestone_intro
-    )
-
-    # 5) Save HTML
+
+    # 5) Stream HTML to disk
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     out_path = output_dir / f"report_{stamp}.html"
     try:
-        out_path.write_text(html_doc, encoding="utf-8")
+        write_html(
+            out_path,
+            title="TestRail Report",
+            generated_for_date=generated_for_date_runs,
+            chart_data_uri=chart_data_uri,
+            milestone_html=milestone_html,
+            testruns_html=testruns_html,
+            milestone_intro_text=args.milestone_intro,
+            chart_png=chart_png
+        )
         print(f"✅ HTML report written to: {out_path}")
     except Exception as e:
         print(f"❌ Failed to write HTML report: {e}", file=sys.stderr)
         return 2
+    finally:
+        if chart_png is not None:
+            chart_png.close()
 
     return 0
 
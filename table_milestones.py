@@ -9,41 +9,265 @@ table_milestones.py — fetch/export TestRail milestones (omni-like JSON) + HTML
 
 from __future__ import annotations
 
+import os
 import sys
 import json
+import time
+import hashlib
+import tempfile
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from functools import lru_cache
 import html
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 
 from config import TESTRAIL_URL, USERNAME, API_KEY, MILESTONE_IDS
 
+# PROJECT_ID enables the single-listing fetch; without it milestones are fetched per ID
+try:
+    from config import PROJECT_ID
+except ImportError:
+    PROJECT_ID = None
+
+# orjson is optional; fall back to stdlib json when the wheel is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Max concurrent milestone GETs in fetch_milestones_map
+FETCH_WORKERS = 8
+
+# Per-milestone on-disk response cache (override location with TSTRL_CACHE_DIR).
+# Milestone ids are only unique per server, so each TESTRAIL_URL gets its own subdirectory.
+# Open milestones move (start/complete), completed ones are effectively frozen.
+MILESTONE_CACHE_DIR = (
+    Path(os.getenv("TSTRL_CACHE_DIR", "~/.cache/tstrl")).expanduser()
+    / "milestones"
+    / hashlib.sha256(TESTRAIL_URL.rstrip("/").encode("utf-8")).hexdigest()[:12]
+)
+CACHE_TTL_OPEN = 30
+CACHE_TTL_COMPLETED = 86400
+
+# status -> (row class, status cell class); unknown statuses get no classes
+_STATUS_CLASSES: Dict[str, Tuple[str, str]] = {
+    "Completed": ("milestone-completed", ""),
+    "In progress": ("milestone-inprogress", "milestone-status-inprogress"),
+}
+# statuses produced by classify_status_from_api; these never need escaping
+_SAFE_STATUSES = frozenset(("Completed", "In progress", "Planned", ""))
+
+# Static milestone table markup; one %-template per row.
+# The only attribute slots in _MILESTONE_ROW are the two class='%s' values, which are
+# filled from _STATUS_CLASSES constants; row data only ever fills <td> text slots.
+_MILESTONE_TABLE_HEAD = "<table class='milestone-table'><tr><th>Name</th><th>Status</th><th>Start</th><th>Due</th></tr>"
+_MILESTONE_TABLE_EMPTY = "<tr><td colspan='4' style='color:#666'>No milestone data available</td></tr>"
+_MILESTONE_ROW = "<tr class='%s'><td>%s</td><td class='%s'>%s</td><td>%s</td><td>%s</td></tr>"
+
+
+def _make_session() -> requests.Session:
+    """
+    Shared keep-alive session for all milestone GETs: one TLS handshake per pooled
+    connection instead of one per request. Sized for FETCH_WORKERS concurrent callers.
+    """
+    session = requests.Session()
+    session.auth = (USERNAME, API_KEY)
+    session.headers.update({"Accept": "application/json"})
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_WORKERS, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = _make_session()
+
+
+def _cache_get(mid: int | str) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached entry {"ts": epoch, "data": {...}} for a milestone, or None.
+    "ts" is bumped to the file's mtime, which a 304 revalidation touches.
+    """
+    try:
+        path = MILESTONE_CACHE_DIR / f"{mid}.json"
+        raw = path.read_bytes()
+        entry = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        if not isinstance(entry, dict) or not isinstance(entry.get("data"), dict):
+            return None
+        if not isinstance(entry.get("ts"), (int, float)):
+            return None
+        entry["ts"] = max(entry["ts"], path.stat().st_mtime)
+        return entry
+    except Exception:
+        return None
+
+
+def _cache_put(mid: int | str, data: Dict[str, Any], etag: Optional[str] = None,
+               last_modified: Optional[str] = None) -> None:
+    """
+    Best-effort atomic write of a fresh milestone payload; failures are ignored.
+    Each write goes through its own temp file, so concurrent writers of the same id
+    (duplicate ids, listing vs per-ID path, parallel runs) never clobber each other's tmp.
+    """
+    entry = {"ts": time.time(), "data": data, "etag": etag, "last_modified": last_modified}
+    tmp = None
+    try:
+        MILESTONE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=MILESTONE_CACHE_DIR, prefix=f"{mid}.", suffix=".tmp",
+                                         delete=False) as f:
+            tmp = f.name
+            f.write(orjson.dumps(entry) if orjson is not None else json.dumps(entry).encode("utf-8"))
+        os.replace(tmp, MILESTONE_CACHE_DIR / f"{mid}.json")
+    except Exception:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def _cache_touch(mid: int | str) -> None:
+    """Restart a cache entry's TTL after a 304 without rewriting its payload."""
+    try:
+        os.utime(MILESTONE_CACHE_DIR / f"{mid}.json")
+    except OSError:
+        pass
+
+
+def _cache_drop(mid: int | str) -> None:
+    """Best-effort removal of a milestone's cache file."""
+    try:
+        (MILESTONE_CACHE_DIR / f"{mid}.json").unlink()
+    except OSError:
+        pass
+
+
+def _miss_put(mid: int | str) -> None:
+    """Remember that a full project listing did not contain this milestone."""
+    try:
+        MILESTONE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (MILESTONE_CACHE_DIR / f"{mid}.miss").touch()
+    except OSError:
+        pass
+
+
+def _miss_is_fresh(mid: int | str) -> bool:
+    """True while a listing miss for this milestone is younger than CACHE_TTL_OPEN."""
+    try:
+        return time.time() - (MILESTONE_CACHE_DIR / f"{mid}.miss").stat().st_mtime < CACHE_TTL_OPEN
+    except OSError:
+        return False
+
+
+def _cache_is_fresh(entry: Dict[str, Any]) -> bool:
+    ttl = CACHE_TTL_COMPLETED if entry["data"].get("is_completed") else CACHE_TTL_OPEN
+    return time.time() - entry.get("ts", 0) < ttl
+
 
 def get_milestone(mid: int | str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch one milestone, served from the on-disk cache while it is fresh and
+    revalidated with ETag/Last-Modified once it is not.
+    If TestRail is unreachable or answers 429/5xx, a cached copy of any age is
+    returned instead of None; other errors return None (404 also drops the cache).
+    """
+    cached = _cache_get(mid)
+    if cached is not None and _cache_is_fresh(cached):
+        return cached["data"]
+
+    # revalidate a stale entry with a conditional GET; 304 carries no body
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
     url = f"{TESTRAIL_URL}/index.php?/api/v2/get_milestone/{mid}"
     try:
-        resp = requests.get(url, auth=(USERNAME, API_KEY), timeout=15)
+        resp = _SESSION.get(url, headers=headers, timeout=15)
+        if resp.status_code == 304 and cached is not None:
+            _cache_touch(mid)
+            return cached["data"]
         if resp.status_code != 200:
             print(f"❌ Failed to fetch milestone {mid} (status {resp.status_code})", file=sys.stderr)
+            # only server-side trouble falls back to the cache; a 4xx is TestRail's answer
+            if resp.status_code == 429 or resp.status_code >= 500:
+                return _stale_or_none(mid, cached)
+            if resp.status_code == 404:
+                _cache_drop(mid)
             return None
-        return resp.json()
+        data = orjson.loads(resp.content) if orjson is not None else resp.json()
     except Exception as e:
         print(f"❌ Error fetching milestone {mid}: {e}", file=sys.stderr)
+        return _stale_or_none(mid, cached)
+    _cache_put(mid, data, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    return data
+
+
+def _stale_or_none(mid: int | str, cached: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if cached is None:
         return None
+    print(f"⚠️ Using cached copy of milestone {mid}", file=sys.stderr)
+    return cached["data"]
+
+
+def _list_project_milestones(wanted: Dict[int, int]) -> Tuple[Dict[int, Dict[str, Any]], bool]:
+    """
+    Fetch PROJECT_ID's milestones via get_milestones (following pagination) and
+    return (raw payloads whose id is in `wanted`, sub-milestones included, complete).
+    complete is True only if every page was read, i.e. unfound ids are not in the project.
+    Whatever was collected before an error is returned; callers fetch the rest per ID.
+    """
+    found: Dict[int, Dict[str, Any]] = {}
+    complete = False
+    url = f"{TESTRAIL_URL}/index.php?/api/v2/get_milestones/{PROJECT_ID}"
+    try:
+        while url and len(found) < len(wanted):
+            resp = _SESSION.get(url, timeout=30)
+            if resp.status_code != 200:
+                print(f"❌ Failed to list milestones of project {PROJECT_ID} (status {resp.status_code})", file=sys.stderr)
+                break
+            data = orjson.loads(resp.content) if orjson is not None else resp.json()
+            if isinstance(data, dict):
+                # TestRail 6.7+ paginates: { "milestones": [...], "_links": { "next": ... } }
+                page = data.get("milestones") or []
+                nxt = (data.get("_links") or {}).get("next")
+                url = f"{TESTRAIL_URL}/index.php?{nxt}" if nxt else None
+            else:
+                page, url = data or [], None
+            stack = list(page)
+            while stack:
+                m = stack.pop()
+                if not isinstance(m, dict):
+                    continue
+                stack.extend(m.get("milestones") or [])
+                if m.get("id") in wanted:
+                    found[m["id"]] = m
+        else:
+            complete = url is None
+    except Exception as e:
+        print(f"❌ Error listing milestones of project {PROJECT_ID}: {e}", file=sys.stderr)
+    return found, complete
 
 
-def classify_status_from_api(m: Dict[str, Any]) -> str:
+def classify_status_from_api(m: Dict[str, Any], now_ts: Optional[int] = None) -> str:
     """
     Determine display status using API fields.
     Completed is taken from m.get('is_completed') explicitly.
     If start_on is missing, treat as Planned.
     Otherwise use start_on relative to now to determine Planned or In progress.
+    Pass now_ts when classifying a batch so the clock is read once.
     """
     if m.get("is_completed"):
         return "Completed"
-    now_ts = int(datetime.now(timezone.utc).timestamp())
+    if now_ts is None:
+        now_ts = int(datetime.now(timezone.utc).timestamp())
     start = m.get("start_on")
     if start is None:
         return "Planned"
@@ -57,11 +281,30 @@ def classify_status_from_api(m: Dict[str, Any]) -> str:
 def format_ts(ts: Optional[int]) -> str:
     if not ts:
         return "TBD"
+    return _format_day(int(ts))
+
+
+@lru_cache(maxsize=1024)
+def _format_day(ts: int) -> str:
+    # milestones cluster on shared release dates, so identical epochs repeat;
+    # direct field formatting also skips strftime's format interpreter
     dt = datetime.fromtimestamp(ts, tz=timezone.utc)
-    return dt.strftime("%Y-%m-%d")
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+
+
+def _normalize_milestone(m: Dict[str, Any], now_ts: int) -> Dict[str, Any]:
+    """Reduce a raw API milestone to the { name, status, start, due, is_completed_raw } record."""
+    return {
+        "name": m.get("name", "Unnamed"),
+        "status": classify_status_from_api(m, now_ts),
+        "start": format_ts(m.get("start_on")),
+        "due": format_ts(m.get("due_on")),
+        # Use is_completed from API directly; kept as a bool (JSON true/false)
+        "is_completed_raw": bool(m.get("is_completed")),
+    }
 
 
-def fetch_milestones_map() -> Dict[str, Dict[str, str]]:
+def fetch_milestones_map() -> Dict[str, Dict[str, Any]]:
     """
     Fetch milestones for IDs in MILESTONE_IDS.
     Returns dict[id] -> { name, status, start, due, is_completed_raw }
@@ -70,66 +313,96 @@ def fetch_milestones_map() -> Dict[str, Dict[str, str]]:
         print("⚠️ MILESTONE_IDS is not set or invalid in config.py", file=sys.stderr)
         return {}
 
-    milestone_map: Dict[str, Dict[str, str]] = {}
-    for mid in MILESTONE_IDS:
-        m = get_milestone(mid)
-        if not m:
-            continue
-        # Use is_completed from API directly
-        is_completed_raw = bool(m.get("is_completed"))
-        status = classify_status_from_api(m)
-        name = m.get("name", "Unnamed")
-        start = format_ts(m.get("start_on"))
-        due = format_ts(m.get("due_on"))
-        milestone_map[str(mid)] = {
-            "name": name,
-            "status": status,
-            "start": start,
-            "due": due,
-            # keep raw indicator for debugging or future logic
-            "is_completed_raw": "true" if is_completed_raw else "false"
-        }
+    now_ts = int(datetime.now(timezone.utc).timestamp())
+    records: List[Optional[Dict[str, Any]]] = [None] * len(MILESTONE_IDS)
+
+    if PROJECT_ID:
+        # One listing call replaces the per-ID GETs for everything not fresh in cache
+        wanted: Dict[int, int] = {}
+        for idx, mid in enumerate(MILESTONE_IDS):
+            cached = _cache_get(mid)
+            if cached is not None and _cache_is_fresh(cached):
+                records[idx] = _normalize_milestone(cached["data"], now_ts)
+                continue
+            if _miss_is_fresh(mid):
+                # recently absent from the full listing; go straight to the per-ID GET
+                continue
+            try:
+                wanted[int(mid)] = idx
+            except (TypeError, ValueError):
+                pass
+        if wanted:
+            found, complete = _list_project_milestones(wanted)
+            for nid, m in found.items():
+                _cache_put(nid, m)
+                records[wanted[nid]] = _normalize_milestone(m, now_ts)
+            if complete:
+                for nid in wanted.keys() - found.keys():
+                    _miss_put(nid)
+
+    # Whatever is left (no PROJECT_ID, listing failed, id not in project) is
+    # fetched per ID. Requests are pure network I/O: overlap them on a small
+    # thread pool and normalize each milestone as soon as its response lands.
+    pending = [(idx, mid) for idx, mid in enumerate(MILESTONE_IDS) if records[idx] is None]
+    workers = max(1, min(FETCH_WORKERS, len(pending)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(get_milestone, mid): idx for idx, mid in pending}
+        for fut in as_completed(futures):
+            m = fut.result()
+            if m:
+                records[futures[fut]] = _normalize_milestone(m, now_ts)
+
+    # assemble in configured order
+    milestone_map: Dict[str, Dict[str, Any]] = {}
+    for mid, record in zip(MILESTONE_IDS, records):
+        if record is not None:
+            milestone_map[str(mid)] = record
     return milestone_map
 
 
-def _parse_start_date(s: str) -> Optional[datetime]:
-    if not s or s == "TBD":
-        return None
-    try:
-        return datetime.strptime(s, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-    except Exception:
-        return None
+def _start_sort_key(s: Any) -> Optional[str]:
+    """
+    Return s if it is a zero-padded YYYY-MM-DD date, else None.
+    Such strings order lexicographically exactly like the dates they encode,
+    so sorting can compare them directly instead of parsing each with strptime.
+    """
+    if (isinstance(s, str) and len(s) == 10 and s[4] == "-" and s[7] == "-"
+            and s[:4].isdigit() and s[5:7].isdigit() and s[8:].isdigit()):
+        return s
+    return None
 
 
-def build_rows_from_map(milestone_map: Dict[str, Dict[str, str]]) -> List[Dict[str, str]]:
+def build_rows_from_map(milestone_map: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Build rows sorted by start ascending (missing start last).
     """
+    return list(_iter_sorted_rows(milestone_map))
+
+
+def _iter_sorted_rows(milestone_map: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield row dicts in build_rows_from_map order, one at a time."""
     def _key(item):
         mid, data = item
-        start_dt = _parse_start_date(data.get("start", "TBD"))
-        has_start_flag = 0 if start_dt is not None else 1
+        start = _start_sort_key(data.get("start", "TBD"))
+        has_start_flag = 0 if start is not None else 1
         try:
             nid = int(mid)
         except Exception:
             nid = mid
-        return (has_start_flag, start_dt or datetime.max.replace(tzinfo=timezone.utc), nid)
+        return (has_start_flag, start or "", nid)
 
-    items = sorted(milestone_map.items(), key=_key)
-    rows: List[Dict[str, str]] = []
-    for mid, m in items:
-        rows.append({
+    for mid, m in sorted(milestone_map.items(), key=_key):
+        yield {
             "id": str(mid),
             "name": m.get("name", ""),
             "status": m.get("status", ""),
             "start": m.get("start", "TBD"),
             "due": m.get("due", "TBD"),
-            "is_completed_raw": m.get("is_completed_raw", "false")
-        })
-    return rows
+            "is_completed_raw": m.get("is_completed_raw", False)
+        }
 
 
-def write_omni_json(path: Path, generated_for_date: str, rows: List[Dict[str, str]], milestone_map: Dict[str, Dict[str, str]]) -> bool:
+def write_omni_json(path: Path, generated_for_date: str, rows: List[Dict[str, Any]], milestone_map: Dict[str, Dict[str, Any]]) -> bool:
     payload = {
         "generated_for_date": generated_for_date,
         "rows": rows,
@@ -137,7 +410,10 @@ def write_omni_json(path: Path, generated_for_date: str, rows: List[Dict[str, st
     }
     try:
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        if orjson is not None:
+            path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
         print(f"✅ Milestone JSON written to: {path}")
         return True
     except Exception as e:
@@ -145,7 +421,7 @@ def write_omni_json(path: Path, generated_for_date: str, rows: List[Dict[str, st
         return False
 
 
-def build_console_preview(rows: List[Dict[str, str]]) -> None:
+def build_console_preview(rows: List[Dict[str, Any]]) -> None:
     if not rows:
         print("⚠️ No milestones could be retrieved.", file=sys.stderr)
         return
@@ -155,53 +431,49 @@ def build_console_preview(rows: List[Dict[str, str]]) -> None:
         print(f"{r['name'][:30]:<30} {r['status']:<12} {r['start']:<12} {r['due']:<12}")
 
 
-def build_milestones_table(milestone_map: Dict[str, Dict[str, str]]) -> str:
+def _date_cell(v: Any) -> str:
+    """HTML for a start/due cell: format_ts output passes through, anything else is escaped."""
+    if v == "TBD" or _start_sort_key(v) is not None:
+        return v
+    return html.escape(str(v), False)
+
+
+def build_milestones_table(milestone_map: Dict[str, Dict[str, Any]],
+                           rows: Optional[List[Dict[str, Any]]] = None) -> str:
     """
     Build HTML table and apply row classes:
       - Completed -> tr class='milestone-completed' (background #D3D3D3 via CSS)
       - In progress -> tr class='milestone-inprogress' (background #cccccc via CSS)
       - Status cell for In progress -> class='milestone-status-inprogress' (green bold)
+    The name (free API text) and unknown statuses are escaped; start/due are emitted
+    as-is only when they have format_ts's shape ("YYYY-MM-DD" or "TBD").
+    Pass rows already returned by build_rows_from_map(milestone_map) to skip re-sorting.
     """
-    if not isinstance(milestone_map, dict):
-        milestone_map = {}
-
-    rows = build_rows_from_map(milestone_map)
-
-    out: List[str] = []
-    out.append("<table class='milestone-table'>")
-    out.append("<tr><th>Name</th><th>Status</th><th>Start</th><th>Due</th></tr>")
-
-    if not rows:
-        out.append("<tr><td colspan='4' style='color:#666'>No milestone data available</td></tr>")
-        out.append("</table>")
-        return "".join(out)
-
+    if rows is None:
+        if not isinstance(milestone_map, dict) or not milestone_map:
+            return _MILESTONE_TABLE_HEAD + _MILESTONE_TABLE_EMPTY + "</table>"
+        rows = _iter_sorted_rows(milestone_map)
+    elif not rows:
+        return _MILESTONE_TABLE_HEAD + _MILESTONE_TABLE_EMPTY + "</table>"
+
+    # every row field lands in <td> text, never in an attribute (see _MILESTONE_ROW),
+    # so quote=False is safe: " and ' are emitted literally instead of as entities.
+    # Anything routed into an attribute must use escape(..., True).
+    escape = html.escape
+    out: List[str] = [_MILESTONE_TABLE_HEAD]
+    # rows are rendered as they are produced; no intermediate row list
     for r in rows:
-        name = html.escape(str(r.get("name", "")))
         status = str(r.get("status", ""))
-        start = html.escape(str(r.get("start", "TBD")))
-        due = html.escape(str(r.get("due", "TBD")))
-
         # Decide classes strictly from status (which itself was derived from is_completed)
-        if status == "Completed":
-            row_class = "milestone-completed"
-            status_class = ""
-        elif status == "In progress":
-            row_class = "milestone-inprogress"
-            status_class = "milestone-status-inprogress"
-        else:
-            row_class = ""
-            status_class = ""
-
-        out.append(
-            f"<tr class='{row_class}'>"
-            f"<td>{name}</td>"
-            f"<td class='{status_class}'>{html.escape(status)}</td>"
-            f"<td>{start}</td>"
-            f"<td>{due}</td>"
-            f"</tr>"
-        )
-
+        row_class, status_class = _STATUS_CLASSES.get(status, ("", ""))
+        out.append(_MILESTONE_ROW % (
+            row_class,
+            escape(str(r.get("name", "")), False),
+            status_class,
+            status if status in _SAFE_STATUSES else escape(status, False),
+            _date_cell(r.get("start", "TBD")),
+            _date_cell(r.get("due", "TBD")),
+        ))
     out.append("</table>")
     return "".join(out)
 
@@ -10,14 +10,27 @@ Behavior:
   the group will be renamed to the TestRail plan name by querying get_plan/<id>.
 - TestRail credentials are read from config.py (optional) or from environment variables:
   TESTRAIL_URL, TESTRAIL_USERNAME, TESTRAIL_API_KEY.
+- get_plan results are cached for TESTRAIL_PLAN_TTL seconds (default 300), in memory and
+  in TESTRAIL_PLAN_CACHE (default ~/.cache/tstrl/plans.json).
 - No debug output included.
 """
 from __future__ import annotations
 
 import html
+import json
 import os
-from collections import defaultdict
-from typing import Dict, Any, Optional
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterator, Optional, TextIO, Tuple
+
+# orjson is optional; fall back to requests' stdlib json decoding when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Optional config import (safe if missing)
 try:
@@ -30,10 +43,26 @@ PLAN_NAME_MAP: Dict[int, str] = {}
 if config is not None:
     PLAN_NAME_MAP = getattr(config, "PLAN_NAME_MAP", {}) or {}
 
+@lru_cache(maxsize=4096)
+def _esc_cached(s: str) -> str:
+    return html.escape(s)
+
 def _esc(x):
-    return html.escape(str(x)) if x is not None else ""
+    """Escape low-cardinality labels (plan keys, configurations); results are memoized."""
+    return _esc_cached(str(x)) if x is not None else ""
+
+def _safe_int(v, default: int = 0) -> int:
+    """int(v), or default when v is missing or not convertible."""
+    if type(v) is int:
+        return v
+    try:
+        return int(v)
+    except (TypeError, ValueError, OverflowError):
+        return default
 
+@lru_cache(maxsize=1)
 def _get_testrail_credentials():
+    """Resolve (base, user, key) from config.py, then env; resolved once per process."""
     try:
         base = getattr(config, "TESTRAIL_URL", None)
         user = getattr(config, "TESTRAIL_USERNAME", None) or getattr(config, "USERNAME", None)
@@ -47,32 +76,154 @@ def _get_testrail_credentials():
         return base.rstrip('/'), user, key
     return None, None, None
 
+def refresh_credentials() -> None:
+    """
+    Drop the cached credentials (_get_testrail_credentials.cache_clear()) so the next API
+    call re-reads config/env. Call it after changing config or the environment, e.g. in tests.
+    """
+    _get_testrail_credentials.cache_clear()
+
+# Pooled keep-alive session for get_plan calls, created on first use
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def _get_session():
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            return _SESSION
+        import requests  # lazy import
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        session.headers["Accept"] = "application/json"
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _SESSION = session
+    return _SESSION
+
+# get_plan cache: "<base url>|<plan_id>" -> (fetched_at epoch, info); env-tunable lifetime.
+# Plan ids are only unique per server, hence the base url in the key.
+# Mirrored to a JSON file so scheduled runs in fresh processes start warm.
+def _env_float(name: str, default: float) -> float:
+    """float(os.getenv(name)), or default when unset or malformed (import must not fail)."""
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+PLAN_INFO_TTL = _env_float("TESTRAIL_PLAN_TTL", 300.0)
+PLAN_CACHE_PATH = os.path.expanduser(
+    os.getenv("TESTRAIL_PLAN_CACHE")
+    or os.path.join(os.getenv("TSTRL_CACHE_DIR", "~/.cache/tstrl"), "plans.json")
+)
+_PLAN_INFO_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_PLAN_CACHE_LOCK = threading.Lock()
+_PLAN_CACHE_LOADED = False
+_PLAN_CACHE_DIRTY = False
+
+def _load_plan_cache() -> None:
+    """Merge the on-disk plan cache into memory, once per process; errors are ignored."""
+    global _PLAN_CACHE_LOADED
+    if _PLAN_CACHE_LOADED:
+        return
+    _PLAN_CACHE_LOADED = True
+    try:
+        with open(PLAN_CACHE_PATH, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        for key, entry in raw.items():
+            if "|" not in key:
+                continue  # pre-scoping entry: server unknown
+            info = {"name": entry["name"], "run_ids": frozenset(int(x) for x in entry["run_ids"])}
+            _PLAN_INFO_CACHE.setdefault(key, (float(entry["ts"]), info))
+    except Exception:
+        pass
+
+def _save_plan_cache() -> None:
+    """
+    Best-effort atomic rewrite of the on-disk plan cache if anything was fetched since
+    the last save; expired entries are dropped. The file is written outside the lock,
+    through a uniquely named temp file, so concurrent processes never share a tmp path.
+    """
+    global _PLAN_CACHE_DIRTY
+    now = time.time()
+    with _PLAN_CACHE_LOCK:
+        if not _PLAN_CACHE_DIRTY:
+            return
+        _PLAN_CACHE_DIRTY = False
+        payload = {
+            key: {"ts": ts, "name": info["name"], "run_ids": sorted(info["run_ids"])}
+            for key, (ts, info) in _PLAN_INFO_CACHE.items()
+            if now - ts < PLAN_INFO_TTL
+        }
+    tmp = None
+    try:
+        cache_dir = os.path.dirname(PLAN_CACHE_PATH) or "."
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=cache_dir, suffix=".tmp",
+                                         prefix=os.path.basename(PLAN_CACHE_PATH) + ".", delete=False) as f:
+            tmp = f.name
+            json.dump(payload, f)
+        os.replace(tmp, PLAN_CACHE_PATH)
+    except Exception:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
 def _get_testrail_plan_info(plan_id: int, timeout: int = 8) -> Optional[Dict[str, Any]]:
     """
-    Return {'name': str, 'run_ids': set[int]} on success, or None on error/missing credentials.
+    Return {'name': str, 'run_ids': frozenset[int]} on success, or None on error/missing credentials.
+    Successful lookups are reused for PLAN_INFO_TTL seconds; they reach PLAN_CACHE_PATH
+    (and so later processes) on the next _save_plan_cache(). Failures are retried next call.
     """
+    global _PLAN_CACHE_DIRTY
+    plan_id = int(plan_id)
+    key = f"{_get_testrail_credentials()[0]}|{plan_id}"
+    with _PLAN_CACHE_LOCK:
+        _load_plan_cache()
+        hit = _PLAN_INFO_CACHE.get(key)
+    now = time.time()
+    if hit is not None and now - hit[0] < PLAN_INFO_TTL:
+        return hit[1]
+    info = _fetch_testrail_plan_info(plan_id, timeout)
+    if info is not None:
+        with _PLAN_CACHE_LOCK:
+            _PLAN_INFO_CACHE[key] = (now, info)
+            _PLAN_CACHE_DIRTY = True
+    return info
+
+def _fetch_testrail_plan_info(plan_id: int, timeout: int) -> Optional[Dict[str, Any]]:
     base, user, key = _get_testrail_credentials()
     if not (base and user and key):
         return None
     try:
-        import requests  # lazy import
         url = f"{base}/index.php?/api/v2/get_plan/{int(plan_id)}"
-        resp = requests.get(url, auth=(user, key), timeout=timeout)
+        resp = _get_session().get(url, auth=(user, key), timeout=timeout)
         resp.raise_for_status()
-        data = resp.json()
-        run_ids = set()
-        for entry in data.get("entries", []):
-            for run in entry.get("runs", []):
-                rid = run.get("id")
-                if rid is not None:
-                    try:
-                        run_ids.add(int(rid))
-                    except Exception:
-                        continue
+        data = orjson.loads(resp.content) if orjson is not None else resp.json()
+        # ids are validated up front, so int() cannot raise inside the comprehension
+        run_ids = frozenset(
+            int(rid)
+            for entry in data.get("entries") or ()
+            for run in entry.get("runs") or ()
+            for rid in (run.get("id"),)
+            if type(rid) is int or (isinstance(rid, str) and rid.isascii() and rid.isdigit())
+        )
         return {"name": data.get("name") or f"Plan {plan_id}", "run_ids": run_ids}
     except Exception:
         return None
 
+# Concurrent get_plan lookups per remap. Kept small on purpose: lookups are consumed in
+# candidate order, and once one matches, only still-queued lookups are cancelled. The up to
+# PLAN_LOOKUP_WORKERS already in flight run to completion (at worst timeout x retries),
+# and the interpreter joins them at exit. A small cap bounds both those wasted calls and
+# that exit delay, while still overlapping the first few round trips.
+PLAN_LOOKUP_WORKERS = 3
+
 def _remap_unplanned_by_plan_run_ids(groups: Dict[str, list], candidate_plan_ids: list) -> Dict[str, list]:
     """
     If 'Unplanned' exists and its rows include run_id values that match any plan's runs,
@@ -83,71 +234,171 @@ def _remap_unplanned_by_plan_run_ids(groups: Dict[str, list], candidate_plan_ids
         return groups
     unplanned_rows = groups["Unplanned"]
 
-    # first, try config map quickly
-    for pid in candidate_plan_ids:
-        mapped_name = PLAN_NAME_MAP.get(int(pid))
-        if mapped_name:
-            pid_s = str(pid)
-            for r in unplanned_rows:
-                if str(r.get("run_id")) == pid_s:
-                    groups[mapped_name] = groups.get(mapped_name, []) + groups.pop("Unplanned")
-                    return groups
-
-    # then, try API-based remap per candidate id
-    for pid in candidate_plan_ids:
-        info = _get_testrail_plan_info(int(pid))
-        if not info:
-            continue
-        run_ids_in_plan = info.get("run_ids", set())
-        if not run_ids_in_plan:
+    # index the unplanned run_ids once instead of rescanning rows per candidate
+    unplanned_rid_strs = {str(r.get("run_id")) for r in unplanned_rows}
+    unplanned_rids = set()
+    for rid in unplanned_rid_strs:
+        try:
+            unplanned_rids.add(int(rid))
+        except ValueError:
             continue
-        matched = [r for r in unplanned_rows if r.get("run_id") is not None and int(str(r.get("run_id"))) in run_ids_in_plan]
-        if matched:
-            plan_name = info.get("name") or f"Plan {pid}"
-            groups[plan_name] = groups.get(plan_name, []) + groups.pop("Unplanned")
-            return groups
+    # nothing any plan could match: skip the map scan and every get_plan call
+    if not unplanned_rids:
+        return groups
+
+    # first, try config map quickly (empty by default, so usually skipped)
+    if PLAN_NAME_MAP:
+        for pid in candidate_plan_ids:
+            mapped_name = PLAN_NAME_MAP.get(int(pid))
+            if mapped_name and str(pid) in unplanned_rid_strs:
+                groups[mapped_name] = groups.get(mapped_name, []) + groups.pop("Unplanned")
+                return groups
+
+    # then, try API-based remap per candidate id; lookups run concurrently but are
+    # consumed in candidate order, so the first matching candidate still wins
+    if not candidate_plan_ids:
+        return groups
+    pool = ThreadPoolExecutor(max_workers=min(PLAN_LOOKUP_WORKERS, len(candidate_plan_ids)))
+    try:
+        futures = [(pid, pool.submit(_get_testrail_plan_info, int(pid))) for pid in candidate_plan_ids]
+        for pid, fut in futures:
+            info = fut.result()
+            if not info:
+                continue
+            run_ids_in_plan = info.get("run_ids", set())
+            if not run_ids_in_plan:
+                continue
+            if not unplanned_rids.isdisjoint(run_ids_in_plan):
+                plan_name = info.get("name") or f"Plan {pid}"
+                groups[plan_name] = groups.get(plan_name, []) + groups.pop("Unplanned")
+                return groups
+    finally:
+        # cancel queued lookups that can no longer change the result; in-flight ones
+        # finish in the background (see PLAN_LOOKUP_WORKERS)
+        pool.shutdown(wait=False, cancel_futures=True)
+        # one plans.json rewrite per remap, covering every lookup that finished
+        _save_plan_cache()
     return groups
 
-def build_testruns_table(run_rows: list, grand: dict) -> str:
+# Row keys that may carry the plan, in priority order (all lowercase)
+_PLAN_KEY_CANDIDATES = ("plan", "plan_id", "plan_name", "plan_title", "planned_for")
+_PLAN_KEY_SET = frozenset(_PLAN_KEY_CANDIDATES)
+
+# One run row: label, planned, exec %/#, not-exec %/#, gap classes, passed %/#, failed %/#
+_ROW_TMPL = (
+    '<tr><td class="left">%s</td><td>%d</td><td>%s</td><td>%d</td><td>%s</td><td>%d</td>'
+    '<td class="%s"></td><td>%s</td><td>%d</td><td>%s</td><td>%d</td></tr>'
+)
+# Gap cell classes indexed by (first row) | (last row) << 1
+_GAP = ("gap", "gap gap-top", "gap gap-bottom", "gap gap-top gap-bottom")
+# Per-plan and overall totals: planned, exec %/#, not-exec %/#, passed %/#, failed %/#
+_TOTALS_CELLS = (
+    '<td>%d</td><td>%s</td><td>%d</td><td>%s</td><td>%d</td>'
+    '<td class="gap gap-bottom"></td><td>%s</td><td>%d</td><td>%s</td><td>%d</td></tr>'
+)
+_GROUP_TOTAL_TMPL = '<tr class="group-totals"><td class="left"><strong>TOTAL</strong></td>' + _TOTALS_CELLS
+_GRAND_TOTAL_TMPL = '<tr class="grand"><td class="left">GRAND TOTAL</td>' + _TOTALS_CELLS
+
+# Inline stylesheet and table opening tag, emitted ahead of the header
+_CSS_TABLE = """
+    <style>
+    .runs-table { border-collapse: collapse; width:100%; max-width:1200px; margin-bottom:12px; font-family:Arial,Helvetica,sans-serif; }
+    .runs-table th, .runs-table td { border:1px solid #333; padding:6px 8px; text-align:center; vertical-align:middle; }
+    .runs-table th { background:#696969; color:#fff; font-weight:700; }
+    .runs-table td.left { text-align:left; }
+    .runs-table td.gap { width:10px; background:transparent; border-left:1px solid #333; border-right:1px solid #333; border-top:none; border-bottom:none; }
+    .runs-table td.gap.gap-top { border-top:1px solid #333; }
+    .runs-table td.gap.gap-bottom { border-bottom:1px solid #333; }
+    .runs-table .grand { font-weight:700; background:transparent; }
+    .runs-table td { background: transparent; color:#111; }
+    .runs-table thead th:first-child { text-align:left; }
+    .runs-table .group-sep { background: #f4f4f4; text-align:left; font-weight:700; padding:8px 10px; }
+    .runs-table .group-totals { font-weight:700; background:transparent; }
+    .muted { color:#666; font-size:0.9em; margin-left:6px; }
+    </style>
+    """
+_TABLE_OPEN = '<table class="runs-table" role="table" aria-label="Runs table grouped by plan">'
+
+# Static three-row table header
+_THEAD_HTML = (
+    '<thead>'
+    '<tr>'
+    '<th rowspan="3">Run Name [Configuration]</th>'
+    '<th rowspan="3">Planned</th>'
+    '<th colspan="2">Executed</th>'
+    '<th colspan="2">Not Executed</th>'
+    '<th class="gap" rowspan="3"></th>'
+    '<th colspan="4">Out of executed</th>'
+    '</tr>'
+    '<tr><th colspan="2"></th><th colspan="2"></th><th colspan="2">Passed</th><th colspan="2">Failed</th></tr>'
+    '<tr><th>%</th><th>#</th><th>%</th><th>#</th><th>%</th><th>#</th><th>%</th><th>#</th></tr>'
+    '</thead>'
+)
+_TBODY_OPEN = '<tbody>'
+_TBODY_CLOSE = '</tbody></table>'
+_NO_RUNS_ROW = '<tr><td class="left" colspan="11" style="border:1px solid #eee; color:#666;">No runs to display</td></tr>'
+
+def build_testruns_table(run_rows: list, grand: dict, sink: Optional[TextIO] = None) -> Optional[str]:
     """
     Render all runs in a single HTML table, grouped by plan.
+    With sink, fragments are written to it as they are produced and None is returned.
+    """
+    chunks = iter_testruns_table(run_rows, grand)
+    if sink is None:
+        return "\n".join(chunks)
+    write = sink.write
+    write(next(chunks))
+    for chunk in chunks:
+        write("\n")
+        write(chunk)
+    return None
+
+def iter_testruns_table(run_rows: list, grand: dict) -> Iterator[str]:
+    """
+    Yield the runs table as HTML fragments, in document order.
+    build_testruns_table joins them with newlines.
     """
     rows = run_rows or []
     grand = grand or {}
 
     # plan key extraction helper (avoid using numeric 'planned' count as key)
     def plan_key_value(r: Dict[str, Any]) -> str:
-        candidates = ("plan", "plan_id", "plan_name", "plan_title", "planned_for")
-        for k in candidates:
+        for k in _PLAN_KEY_CANDIDATES:
             if k in r and r[k] not in (None, ""):
                 return str(r[k])
-        lk = {kk.lower(): v for kk, v in r.items()}
-        for k in candidates:
-            if k.lower() in lk and lk[k.lower()] not in (None, ""):
-                return str(lk[k.lower()])
+        # case-insensitive fallback; only candidate keys are kept
+        lk = {}
+        for kk, v in r.items():
+            low = kk.lower()
+            if low in _PLAN_KEY_SET:
+                lk[low] = v
+        if lk:
+            for k in _PLAN_KEY_CANDIDATES:
+                if k in lk and lk[k] not in (None, ""):
+                    return str(lk[k])
         return "Unplanned"
 
-    # group rows
-    groups: Dict[str, list] = defaultdict(list)
+    # group rows; keys that are numeric strings (likely plan ids) become remap
+    # candidates, collected in first-seen order as each new group appears
+    groups: Dict[str, list] = {}
+    candidate_plan_ids = []
     for r in rows:
         try:
             key = plan_key_value(r)
         except Exception:
             key = "Unplanned"
-        groups[key].append(r)
+        bucket = groups.get(key)
+        if bucket is None:
+            groups[key] = bucket = []
+            # ASCII digits always parse, so no try/except around int()
+            if key.isascii() and key.isdigit():
+                candidate_plan_ids.append(int(key))
+        bucket.append(r)
 
     # If Unplanned present, attempt to remap using provided candidate plan IDs:
     # - prefer PLAN_NAME_MAP entries
     # - then try API lookup for candidate ids
     # Customize candidate_plan_ids as needed; include 222 as reported.
-    candidate_plan_ids = []
-    # include keys present as numeric strings (likely plan ids) and include 222 as explicit candidate
-    for k in list(groups.keys()):
-        if isinstance(k, str) and k.isdigit():
-            try:
-                candidate_plan_ids.append(int(k))
-            except Exception:
-                pass
     # explicit fallback: include 222 if not already present
     if 222 not in candidate_plan_ids:
         candidate_plan_ids.append(222)
@@ -155,129 +406,66 @@ def build_testruns_table(run_rows: list, grand: dict) -> str:
     groups = _remap_unplanned_by_plan_run_ids(groups, candidate_plan_ids)
 
     # stable order, Unplanned last
-    plan_keys = sorted(k for k in groups.keys() if k != "Unplanned")
-    if "Unplanned" in groups:
-        plan_keys.append("Unplanned")
+    unplanned_rows = groups.pop("Unplanned", None)
+    plan_groups = sorted(groups.items())
+    if unplanned_rows is not None:
+        plan_groups.append(("Unplanned", unplanned_rows))
 
-    # CSS + header
-    css_table = """
-    <style>
-    .runs-table { border-collapse: collapse; width:100%; max-width:1200px; margin-bottom:12px; font-family:Arial,Helvetica,sans-serif; }
-    .runs-table th, .runs-table td { border:1px solid #333; padding:6px 8px; text-align:center; vertical-align:middle; }
-    .runs-table th { background:#696969; color:#fff; font-weight:700; }
-    .runs-table td.left { text-align:left; }
-    .runs-table td.gap { width:10px; background:transparent; border-left:1px solid #333; border-right:1px solid #333; border-top:none; border-bottom:none; }
-    .runs-table td.gap.gap-top { border-top:1px solid #333; }
-    .runs-table td.gap.gap-bottom { border-bottom:1px solid #333; }
-    .runs-table .grand { font-weight:700; background:transparent; }
-    .runs-table td { background: transparent; color:#111; }
-    .runs-table thead th:first-child { text-align:left; }
-    .runs-table .group-sep { background: #f4f4f4; text-align:left; font-weight:700; padding:8px 10px; }
-    .runs-table .group-totals { font-weight:700; background:transparent; }
-    .muted { color:#666; font-size:0.9em; margin-left:6px; }
-    </style>
-    """
-
-    header_rows = [
-        '<tr>'
-        '<th rowspan="3">Run Name [Configuration]</th>'
-        '<th rowspan="3">Planned</th>'
-        '<th colspan="2">Executed</th>'
-        '<th colspan="2">Not Executed</th>'
-        '<th class="gap" rowspan="3"></th>'
-        '<th colspan="4">Out of executed</th>'
-        '</tr>',
-        '<tr><th colspan="2"></th><th colspan="2"></th><th colspan="2">Passed</th><th colspan="2">Failed</th></tr>',
-        '<tr><th>%</th><th>#</th><th>%</th><th>#</th><th>%</th><th>#</th><th>%</th><th>#</th></tr>'
-    ]
-
-    out = []
-    out.append(css_table)
-    out.append(f'<table class="runs-table" role="table" aria-label="Runs table grouped by plan">')
-    out.append('<thead>' + "".join(header_rows) + '</thead>')
-    out.append('<tbody>')
+    yield _CSS_TABLE
+    yield _TABLE_OPEN
+    yield _THEAD_HTML
+    yield _TBODY_OPEN
 
     overall_totals = {"planned": 0, "executed": 0, "not_executed": 0, "passed": 0, "failed": 0}
     any_rows = False
-
-    for plan_key in plan_keys:
-        group_rows = groups[plan_key]
+    # per-row helpers bound to locals (LOAD_FAST instead of global/attribute lookups);
+    # numeric cells need no escaping
+    escape = html.escape
+    esc_label = _esc
+    safe_int = _safe_int
+    row_tmpl = _ROW_TMPL
+
+    for plan_key, group_rows in plan_groups:
         if not group_rows:
             continue
 
         any_rows = True
-        out.append(f'<tr><td class="group-sep" colspan="11">Plan: {_esc(plan_key)}</td></tr>')
+        yield f'<tr><td class="group-sep" colspan="11">Plan: {_esc(plan_key)}</td></tr>'
 
         g_planned = g_executed = g_not = g_passed = g_failed = 0
-        total = len(group_rows)
+        last = len(group_rows) - 1
 
         for idx, r in enumerate(group_rows):
             run_name = r.get("run_name") or r.get("name") or r.get("run_label") or f"Run {r.get('run_id','')}"
             config = r.get("configuration") or r.get("config") or r.get("suite_name") or r.get("env") or ""
+            run_label_cell = escape(run_name if type(run_name) is str else str(run_name))
             if config:
-                run_label_cell = f"{html.escape(str(run_name))} [{html.escape(str(config))}]"
-            else:
-                run_label_cell = html.escape(str(run_name))
+                run_label_cell = f"{run_label_cell} [{esc_label(config)}]"
 
-            try:
-                planned = int(r.get("planned", r.get("Planned", 0)))
-            except Exception:
-                planned = 0
-            try:
-                executed = int(r.get("executed", r.get("Executed", 0)))
-            except Exception:
-                executed = 0
-            try:
-                blocked = int(r.get("blocked", 0))
-            except Exception:
-                blocked = 0
-            try:
-                untested = int(r.get("untested", 0))
-            except Exception:
-                untested = 0
+            planned = safe_int(r.get("planned", r.get("Planned", 0)))
+            executed = safe_int(r.get("executed", r.get("Executed", 0)))
+            blocked = safe_int(r.get("blocked", 0))
+            untested = safe_int(r.get("untested", 0))
 
             if (blocked or untested):
                 not_executed = blocked + untested
             else:
-                try:
-                    not_executed = int(r.get("not_executed", max(0, planned - executed)))
-                except Exception:
-                    not_executed = max(0, planned - executed)
+                not_executed_default = max(0, planned - executed)
+                not_executed = safe_int(r.get("not_executed", not_executed_default), not_executed_default)
 
-            try:
-                passed = int(r.get("passed", 0))
-            except Exception:
-                passed = 0
-            try:
-                failed = int(r.get("failed", 0))
-            except Exception:
-                failed = 0
+            passed = safe_int(r.get("passed", 0))
+            failed = safe_int(r.get("failed", 0))
 
             executed_pct = f"{(executed / planned * 100):.1f}%" if planned else "0.0%"
             not_executed_pct = f"{(not_executed / planned * 100):.1f}%" if planned else "0.0%"
             passed_pct = f"{(passed / executed * 100):.1f}%" if executed else "0.0%"
             failed_pct = f"{(failed / executed * 100):.1f}%" if executed else "0.0%"
 
-            gap_classes = "gap"
-            if idx == 0:
-                gap_classes += " gap-top"
-            if idx == total - 1:
-                gap_classes += " gap-bottom"
-
-            out.append(
-                '<tr>'
-                f'<td class="left">{run_label_cell}</td>'
-                f'<td>{planned}</td>'
-                f'<td>{executed_pct}</td>'
-                f'<td>{executed}</td>'
-                f'<td>{not_executed_pct}</td>'
-                f'<td>{not_executed}</td>'
-                f'<td class="{gap_classes}"></td>'
-                f'<td>{passed_pct}</td>'
-                f'<td>{passed}</td>'
-                f'<td>{failed_pct}</td>'
-                f'<td>{failed}</td>'
-                '</tr>'
+            gap_classes = _GAP[(idx == 0) | ((idx == last) << 1)]
+
+            yield row_tmpl % (
+                run_label_cell, planned, executed_pct, executed, not_executed_pct, not_executed,
+                gap_classes, passed_pct, passed, failed_pct, failed,
             )
 
             g_planned += planned
@@ -286,77 +474,41 @@ def build_testruns_table(run_rows: list, grand: dict) -> str:
             g_passed += passed
             g_failed += failed
 
-            overall_totals["planned"] += planned
-            overall_totals["executed"] += executed
-            overall_totals["not_executed"] += not_executed
-            overall_totals["passed"] += passed
-            overall_totals["failed"] += failed
+        # fold the group into the overall totals once per group, not per row
+        overall_totals["planned"] += g_planned
+        overall_totals["executed"] += g_executed
+        overall_totals["not_executed"] += g_not
+        overall_totals["passed"] += g_passed
+        overall_totals["failed"] += g_failed
 
         g_executed_pct = f"{(g_executed / g_planned * 100):.1f}%" if g_planned else "0.0%"
         g_not_pct = f"{(g_not / g_planned * 100):.1f}%" if g_planned else "0.0%"
         g_passed_pct = f"{(g_passed / g_executed * 100):.1f}%" if g_executed else "0.0%"
         g_failed_pct = f"{(g_failed / g_executed * 100):.1f}%" if g_executed else "0.0%"
 
-        out.append(
-            '<tr class="group-totals">'
-            '<td class="left"><strong>TOTAL</strong></td>'
-            f'<td>{g_planned}</td>'
-            f'<td>{g_executed_pct}</td>'
-            f'<td>{g_executed}</td>'
-            f'<td>{g_not_pct}</td>'
-            f'<td>{g_not}</td>'
-            f'<td class="gap gap-bottom"></td>'
-            f'<td>{g_passed_pct}</td>'
-            f'<td>{g_passed}</td>'
-            f'<td>{g_failed_pct}</td>'
-            f'<td>{g_failed}</td>'
-            '</tr>'
+        yield _GROUP_TOTAL_TMPL % (
+            g_planned, g_executed_pct, g_executed, g_not_pct, g_not,
+            g_passed_pct, g_passed, g_failed_pct, g_failed,
         )
 
     if not any_rows:
-        out.append('<tr><td class="left" colspan="11" style="border:1px solid #eee; color:#666;">No runs to display</td></tr>')
+        yield _NO_RUNS_ROW
 
-    try:
-        gp = int(grand.get("Planned", grand.get("planned", overall_totals["planned"])))
-    except Exception:
-        gp = overall_totals["planned"]
-    try:
-        ge = int(grand.get("Executed", grand.get("executed", overall_totals["executed"])))
-    except Exception:
-        ge = overall_totals["executed"]
-    try:
-        gn = int(grand.get("Not Executed", grand.get("not_executed", overall_totals["not_executed"])))
-    except Exception:
-        gn = overall_totals["not_executed"]
-    try:
-        gpass = int(grand.get("Passed", grand.get("passed", overall_totals["passed"])))
-    except Exception:
-        gpass = overall_totals["passed"]
-    try:
-        gfail = int(grand.get("Failed", grand.get("failed", overall_totals["failed"])))
-    except Exception:
-        gfail = overall_totals["failed"]
+    ot = overall_totals
+    gp = _safe_int(grand.get("Planned", grand.get("planned", ot["planned"])), ot["planned"])
+    ge = _safe_int(grand.get("Executed", grand.get("executed", ot["executed"])), ot["executed"])
+    gn = _safe_int(grand.get("Not Executed", grand.get("not_executed", ot["not_executed"])), ot["not_executed"])
+    gpass = _safe_int(grand.get("Passed", grand.get("passed", ot["passed"])), ot["passed"])
+    gfail = _safe_int(grand.get("Failed", grand.get("failed", ot["failed"])), ot["failed"])
 
     overall_pct_exec = f"{(ge / gp * 100):.1f}%" if gp else "0.0%"
     overall_pct_not = f"{(gn / gp * 100):.1f}%" if gp else "0.0%"
     overall_pct_pass = f"{(gpass / ge * 100):.1f}%" if ge else "0.0%"
     overall_pct_fail = f"{(gfail / ge * 100):.1f}%" if ge else "0.0%"
 
-    out.append(
-        '<tr class="grand">'
-        '<td class="left">GRAND TOTAL</td>'
-        f'<td>{gp}</td>'
-        f'<td>{overall_pct_exec}</td>'
-        f'<td>{ge}</td>'
-        f'<td>{overall_pct_not}</td>'
-        f'<td>{gn}</td>'
-        f'<td class="gap gap-bottom"></td>'
-        f'<td>{overall_pct_pass}</td>'
-        f'<td>{gpass}</td>'
-        f'<td>{overall_pct_fail}</td>'
-        f'<td>{gfail}</td>'
-        '</tr>'
+    yield _GRAND_TOTAL_TMPL % (
+        gp, overall_pct_exec, ge, overall_pct_not, gn,
+        overall_pct_pass, gpass, overall_pct_fail, gfail,
     )
 
-    out.append('</tbody></table>')
-    return "\n".join(out)
\ No newline at end of file
+    yield _TBODY_CLOSE
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Shared pytest fixtures.
+
+The modules under test import config.py (user credentials, not in the repo) at import
+time, so a minimal stand-in is installed before any of them is imported; the tests
+never talk to a real TestRail server.
+"""
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_config = types.ModuleType("config")
+_config.TESTRAIL_URL = "https://testrail.example"
+_config.USERNAME = "user"
+_config.API_KEY = "key"
+_config.MILESTONE_IDS = []
+_config.PROJECT_ID = None
+sys.modules["config"] = _config
+
+import table_milestones  # noqa: E402
+import table_testruns  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+        self.content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """
+    Stand-in for requests.Session. `responses` is either a list consumed in order or a
+    callable url -> response; an Exception instance is raised instead of returned.
+    Every call is recorded as (url, headers).
+    """
+
+    def __init__(self, responses=None):
+        self.responses = responses if responses is not None else []
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        self.calls.append((url, dict(headers or {})))
+        r = self.responses(url) if callable(self.responses) else self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+@pytest.fixture
+def ms(tmp_path, monkeypatch):
+    """table_milestones with a private cache dir, a fake session and no PROJECT_ID."""
+    monkeypatch.setattr(table_milestones, "MILESTONE_CACHE_DIR", tmp_path / "milestones")
+    monkeypatch.setattr(table_milestones, "_SESSION", FakeSession())
+    monkeypatch.setattr(table_milestones, "PROJECT_ID", None)
+    monkeypatch.setattr(table_milestones, "MILESTONE_IDS", [])
+    return table_milestones
+
+
+@pytest.fixture
+def testruns(tmp_path, monkeypatch):
+    """
+    table_testruns with a private plan cache file and no TestRail env vars.
+    Credentials are resolved once per process, so the cache is cleared around each test.
+    """
+    for var in ("TESTRAIL_URL", "TESTRAIL_USERNAME", "TESTRAIL_API_KEY", "USERNAME", "API_KEY"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(table_testruns, "PLAN_CACHE_PATH", str(tmp_path / "plans.json"))
+    monkeypatch.setattr(table_testruns, "_PLAN_INFO_CACHE", {})
+    monkeypatch.setattr(table_testruns, "_PLAN_CACHE_LOADED", False)
+    monkeypatch.setattr(table_testruns, "_PLAN_CACHE_DIRTY", False)
+    table_testruns.refresh_credentials()
+    yield table_testruns
+    table_testruns.refresh_credentials()
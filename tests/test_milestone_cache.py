@@ -0,0 +1,120 @@
+"""On-disk milestone cache: TTL by status, conditional revalidation, stale fallback."""
+import json
+import os
+import time
+
+import requests
+
+from conftest import FakeResponse
+
+
+def _age(ms, mid, seconds):
+    """Backdate a cache entry (stored ts and file mtime) by `seconds`."""
+    path = ms.MILESTONE_CACHE_DIR / f"{mid}.json"
+    entry = json.loads(path.read_bytes())
+    entry["ts"] -= seconds
+    path.write_text(json.dumps(entry))
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+    return path
+
+
+def test_fresh_entry_is_served_without_request(ms):
+    ms._cache_put(1, {"id": 1, "name": "A"})
+    assert ms.get_milestone(1) == {"id": 1, "name": "A"}
+    assert ms._SESSION.calls == []
+
+
+def test_ttl_depends_on_completion(ms):
+    age = ms.CACHE_TTL_OPEN + 5
+    ms._cache_put(1, {"id": 1, "is_completed": False})
+    ms._cache_put(2, {"id": 2, "is_completed": True})
+    _age(ms, 1, age)
+    _age(ms, 2, age)
+    assert not ms._cache_is_fresh(ms._cache_get(1))
+    assert ms._cache_is_fresh(ms._cache_get(2))
+
+
+def test_cache_get_rejects_malformed_entries(ms):
+    ms.MILESTONE_CACHE_DIR.mkdir(parents=True)
+    (ms.MILESTONE_CACHE_DIR / "1.json").write_text(json.dumps({"ts": "yesterday", "data": {}}))
+    (ms.MILESTONE_CACHE_DIR / "2.json").write_text(json.dumps({"ts": 1, "data": []}))
+    (ms.MILESTONE_CACHE_DIR / "3.json").write_text("{not json")
+    assert ms._cache_get(1) is None
+    assert ms._cache_get(2) is None
+    assert ms._cache_get(3) is None
+
+
+def test_200_stores_payload_and_validators(ms):
+    ms._SESSION.responses.append(
+        FakeResponse(200, {"id": 1, "name": "A"}, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    )
+    assert ms.get_milestone(1) == {"id": 1, "name": "A"}
+    entry = ms._cache_get(1)
+    assert entry["data"] == {"id": 1, "name": "A"}
+    assert entry["etag"] == '"v1"'
+    assert entry["last_modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert ms._SESSION.calls[0][1] == {}
+
+
+def test_stale_entry_is_revalidated_and_304_only_touches_the_file(ms):
+    ms._cache_put(1, {"id": 1, "name": "A"}, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    path = _age(ms, 1, ms.CACHE_TTL_OPEN + 5)
+    before = path.read_bytes()
+    ms._SESSION.responses.append(FakeResponse(304))
+
+    assert ms.get_milestone(1) == {"id": 1, "name": "A"}
+    assert ms._SESSION.calls[0][1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert path.read_bytes() == before
+    assert time.time() - path.stat().st_mtime < 5
+    assert ms._cache_is_fresh(ms._cache_get(1))
+
+
+def test_server_errors_and_network_errors_serve_stale_copy(ms):
+    ms._cache_put(1, {"id": 1, "name": "A"})
+    for failure in (FakeResponse(503), FakeResponse(429), requests.ConnectionError("down")):
+        _age(ms, 1, ms.CACHE_TTL_OPEN + 5)
+        ms._SESSION.responses.append(failure)
+        assert ms.get_milestone(1) == {"id": 1, "name": "A"}
+
+
+def test_server_error_without_cache_returns_none(ms):
+    ms._SESSION.responses.append(FakeResponse(500))
+    assert ms.get_milestone(1) is None
+
+
+def test_404_returns_none_and_drops_entry(ms):
+    ms._cache_put(1, {"id": 1})
+    path = _age(ms, 1, ms.CACHE_TTL_OPEN + 5)
+    ms._SESSION.responses.append(FakeResponse(404))
+    assert ms.get_milestone(1) is None
+    assert not path.exists()
+
+
+def test_other_4xx_returns_none_and_keeps_entry(ms):
+    ms._cache_put(1, {"id": 1})
+    path = _age(ms, 1, ms.CACHE_TTL_OPEN + 5)
+    ms._SESSION.responses.append(FakeResponse(403))
+    assert ms.get_milestone(1) is None
+    assert path.exists()
+
+
+def test_miss_marker_expires_with_open_ttl(ms):
+    assert not ms._miss_is_fresh(7)
+    ms._miss_put(7)
+    assert ms._miss_is_fresh(7)
+    old = time.time() - ms.CACHE_TTL_OPEN - 5
+    os.utime(ms.MILESTONE_CACHE_DIR / "7.miss", (old, old))
+    assert not ms._miss_is_fresh(7)
+
+
+def test_concurrent_puts_leave_no_temp_files(ms):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: ms._cache_put(1, {"id": 1, "i": i}), range(50)))
+    assert sorted(p.name for p in ms.MILESTONE_CACHE_DIR.iterdir()) == ["1.json"]
+    assert ms._cache_get(1)["data"]["id"] == 1
@@ -0,0 +1,93 @@
+"""get_milestones project listing: pagination, sub-milestones and per-ID fallback."""
+from conftest import FakeResponse
+
+BASE = "https://testrail.example/index.php?"
+LIST_URL = BASE + "/api/v2/get_milestones/5"
+PAGE2_URL = BASE + "/api/v2/get_milestones/5&limit=250&offset=250"
+
+
+def _page(milestones, nxt=None):
+    return FakeResponse(200, {"milestones": milestones, "_links": {"next": nxt}})
+
+
+def _router(routes):
+    """Session handler serving fixed responses per URL (missing URL -> 404)."""
+    return lambda url: routes.get(url, FakeResponse(404))
+
+
+def _use_project(ms, monkeypatch, ids, routes):
+    monkeypatch.setattr(ms, "TESTRAIL_URL", "https://testrail.example")
+    monkeypatch.setattr(ms, "PROJECT_ID", 5)
+    monkeypatch.setattr(ms, "MILESTONE_IDS", ids)
+    ms._SESSION.responses = _router(routes)
+
+
+def test_listing_follows_next_links_and_sub_milestones(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [], {
+        LIST_URL: _page([{"id": 1, "name": "one"}], "/api/v2/get_milestones/5&limit=250&offset=250"),
+        PAGE2_URL: _page([{"id": 2, "name": "two", "milestones": [{"id": 3, "name": "three"}]}]),
+    })
+    found, complete = ms._list_project_milestones({1: 0, 3: 1})
+    assert sorted(found) == [1, 3]
+    assert found[3]["name"] == "three"
+    assert complete
+    assert [u for u, _ in ms._SESSION.calls] == [LIST_URL, PAGE2_URL]
+
+
+def test_listing_stops_once_everything_is_found(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [], {
+        LIST_URL: _page([{"id": 1, "name": "one"}], "/api/v2/get_milestones/5&limit=250&offset=250"),
+    })
+    found, complete = ms._list_project_milestones({1: 0})
+    assert list(found) == [1]
+    assert not complete
+    assert [u for u, _ in ms._SESSION.calls] == [LIST_URL]
+
+
+def test_listing_accepts_unpaginated_list(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [], {
+        LIST_URL: FakeResponse(200, [{"id": 1, "name": "one"}, {"id": 2, "name": "two"}]),
+    })
+    found, complete = ms._list_project_milestones({2: 0, 9: 1})
+    assert list(found) == [2]
+    assert complete
+
+
+def test_listing_failure_is_incomplete(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [], {
+        LIST_URL: _page([{"id": 1, "name": "one"}], "/api/v2/get_milestones/5&limit=250&offset=250"),
+        PAGE2_URL: FakeResponse(500),
+    })
+    found, complete = ms._list_project_milestones({1: 0, 2: 1})
+    assert list(found) == [1]
+    assert not complete
+
+
+def test_ids_missing_from_listing_fall_back_to_per_id_get(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [1, 9], {
+        LIST_URL: _page([{"id": 1, "name": "one", "is_completed": True}]),
+        BASE + "/api/v2/get_milestone/9": FakeResponse(200, {"id": 9, "name": "nine"}),
+    })
+    result = ms.fetch_milestones_map()
+    assert list(result) == ["1", "9"]
+    assert result["9"]["name"] == "nine"
+    assert ms._miss_is_fresh(9)
+    assert not ms._miss_is_fresh(1)
+
+
+def test_fresh_miss_skips_the_listing(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [9], {
+        BASE + "/api/v2/get_milestone/9": FakeResponse(200, {"id": 9, "name": "nine"}),
+    })
+    ms._miss_put(9)
+    assert ms.fetch_milestones_map()["9"]["name"] == "nine"
+    assert [u for u, _ in ms._SESSION.calls] == [BASE + "/api/v2/get_milestone/9"]
+
+
+def test_failed_listing_records_no_misses(ms, monkeypatch):
+    _use_project(ms, monkeypatch, [9], {
+        LIST_URL: FakeResponse(500),
+        BASE + "/api/v2/get_milestone/9": FakeResponse(200, {"id": 9, "name": "nine"}),
+    })
+    assert ms.fetch_milestones_map()["9"]["name"] == "nine"
+    assert not ms._miss_is_fresh(9)
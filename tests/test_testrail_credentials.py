@@ -0,0 +1,49 @@
+"""TestRail credential resolution for get_plan lookups and its per-process cache."""
+
+
+def test_credentials_come_from_config(testruns, monkeypatch):
+    monkeypatch.setattr(testruns.config, "TESTRAIL_URL", "https://a.example/")
+    assert testruns._get_testrail_credentials() == ("https://a.example", "user", "key")
+
+
+def test_credentials_are_cached_until_refreshed(testruns, monkeypatch):
+    monkeypatch.setattr(testruns.config, "TESTRAIL_URL", "https://a.example")
+    assert testruns._get_testrail_credentials()[0] == "https://a.example"
+
+    monkeypatch.setattr(testruns.config, "TESTRAIL_URL", "https://b.example")
+    assert testruns._get_testrail_credentials()[0] == "https://a.example"
+
+    testruns.refresh_credentials()
+    assert testruns._get_testrail_credentials()[0] == "https://b.example"
+
+
+def test_env_fills_in_missing_config(testruns, monkeypatch):
+    monkeypatch.setattr(testruns.config, "TESTRAIL_URL", None)
+    monkeypatch.setenv("TESTRAIL_URL", "https://env.example")
+    testruns.refresh_credentials()
+    assert testruns._get_testrail_credentials() == ("https://env.example", "user", "key")
+
+
+def test_incomplete_credentials_resolve_to_none(testruns, monkeypatch):
+    monkeypatch.setattr(testruns.config, "API_KEY", "")
+    testruns.refresh_credentials()
+    assert testruns._get_testrail_credentials() == (None, None, None)
+
+
+def test_plan_cache_is_scoped_by_server(testruns, monkeypatch):
+    fetched = []
+
+    def fetch(plan_id, timeout):
+        base = testruns._get_testrail_credentials()[0]
+        fetched.append((base, plan_id))
+        return {"name": f"{base} plan", "run_ids": frozenset({1})}
+
+    monkeypatch.setattr(testruns, "_fetch_testrail_plan_info", fetch)
+    monkeypatch.setattr(testruns.config, "TESTRAIL_URL", "https://a.example")
+    assert testruns._get_testrail_plan_info(5)["name"] == "https://a.example plan"
+    assert testruns._get_testrail_plan_info(5)["name"] == "https://a.example plan"
+
+    monkeypatch.setattr(testruns.config, "TESTRAIL_URL", "https://b.example")
+    testruns.refresh_credentials()
+    assert testruns._get_testrail_plan_info(5)["name"] == "https://b.example plan"
+    assert fetched == [("https://a.example", 5), ("https://b.example", 5)]